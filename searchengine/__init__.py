@@ -1,22 +1,34 @@
 """Custom (meta) search engine."""
 
 import contextlib
+import functools
 import gettext
+import gzip
+import hashlib
+import hmac
+import http.cookiejar
+import math
+import threading
+import time
+from collections import OrderedDict
 from collections.abc import AsyncIterator
-from http import HTTPStatus
-from typing import TYPE_CHECKING, TypedDict
+from typing import TYPE_CHECKING, NamedTuple, TypedDict
 
 import curl_cffi
 import jinja2
 from curl_cffi.requests import AsyncSession
 from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.datastructures import URL
 from starlette.exceptions import HTTPException
 from starlette.requests import Request
-from starlette.responses import HTMLResponse, Response
+from starlette.responses import HTMLResponse, Response, StreamingResponse
 from starlette.routing import Mount, Route
 from starlette.staticfiles import StaticFiles
-from starlette.templating import Jinja2Templates
+from starlette.types import Scope
 
+from .engines import ENGINE_COUNT
+from .lang import load_model
 from .query import QueryParser, SearchMode
 from .search import MAX_AGE, perform_search
 from .sha import gen_sha
@@ -27,66 +39,211 @@ _TRANSLATION.install()
 if TYPE_CHECKING:
     _ = _TRANSLATION.gettext
 
+
+@jinja2.pass_context
+def _url_for(context: jinja2.runtime.Context, name: str, /, **path_params: str) -> URL:
+    return context["request"].url_for(name, **path_params)
+
+
 _ENV = jinja2.Environment(
     autoescape=True,
     loader=jinja2.FileSystemLoader("templates"),
     lstrip_blocks=True,
     trim_blocks=True,
     extensions=["jinja2.ext.i18n"],
+    bytecode_cache=jinja2.FileSystemBytecodeCache(),
+    # the templates are bound at import, don't check them for changes
+    auto_reload=False,
 )
 _ENV.install_gettext_translations(_TRANSLATION)  # type: ignore[attr-defined]
 _ENV.globals["SearchMode"] = SearchMode
+_ENV.globals["url_for"] = _url_for
 _ENV.filters.update(TEMPLATE_FILTER_MAP)
 
-_TEMPLATES = Jinja2Templates(env=_ENV)
+
+def _compile_templates() -> None:
+    # also compile the templates only used through extends or include at startup
+    for name in _ENV.list_templates():
+        _ENV.get_template(name)
+
+
+_compile_templates()
+
+_ERROR_TEMPLATE = _ENV.get_template("error.html")
+_ERROR_TITLE = _("Error")
+_INDEX_TEMPLATE = _ENV.get_template("index.html")
+_SEARCH_TEMPLATE = _ENV.get_template("search.html")
+_RESULTS_TEMPLATE = _ENV.get_template("results.html")
+_OPENSEARCH_TEMPLATE = _ENV.get_template("opensearch.xml")
 
 _QUERY_PARSER = QueryParser()
+_SEARCH_MODES = {mode.value: mode for mode in SearchMode}
+
+_CACHE_HEADERS = {"Cache-Control": f"max-age={MAX_AGE}"}
+_RESULTS_HEADERS = {"Vary": "Accept-Language", **_CACHE_HEADERS}
+_IMG_HEADERS = {"Cache-Control": f"max-age={MAX_AGE * 10}"}
+_HX_ERROR_HEADERS = {"HX-Retarget": "#target", "HX-Reswap": "outerHTML"}
+_PAGE_HEADERS = {"Vary": "Accept-Encoding", **_CACHE_HEADERS}
+
+# result pages, least recently used ones are evicted as arbitrary clients choose
+# the search terms and the Host header
+_RESULTS_CACHE: OrderedDict[
+    tuple[str, str, SearchMode, int, str, bool], "_CachedResults"
+] = OrderedDict()
+_RESULTS_CACHE_SIZE = 256
+
+# pages which only depend on the base url, least recently used ones are evicted
+# as that comes from the Host header and arbitrary hosts must not fill up memory
+_PAGE_CACHE: OrderedDict[tuple[str, str], "_Page"] = OrderedDict()
+_PAGE_CACHE_SIZE = 16
+
+# a search opens at most one connection per engine; size the pool so a few
+# searches can run at once without queueing, images use their own pool
+_CONCURRENT_SEARCHES = 4
+_MAX_CLIENTS = ENGINE_COUNT * _CONCURRENT_SEARCHES
+# an image result page loads about a dozen images at once
+_IMG_MAX_CLIENTS = 16
 
 
 class _State(TypedDict):
     session: AsyncSession
+    img_session: AsyncSession
+
+
+class _NoCookieJar(http.cookiejar.CookieJar):
+    # the image proxy is shared by all clients, cookies of one image host must
+    # not be sent along with requests made for anybody else
+    def set_cookie(self, cookie: http.cookiejar.Cookie) -> None:
+        pass
+
+
+class _CachedResults(NamedTuple):
+    expires: float
+    content: bytes
+
+
+class _Page(NamedTuple):
+    content: bytes
+    gzipped: bytes
+    headers: dict[str, str]
+    gzip_headers: dict[str, str]
 
 
 @contextlib.asynccontextmanager
 async def _lifespan(app: Starlette) -> AsyncIterator[_State]:
-    async with AsyncSession(impersonate="chrome") as session:
-        yield {"session": session}
+    # load the model while starting up instead of during the first search
+    threading.Thread(target=load_model, daemon=True).start()
+
+    async with (
+        AsyncSession(
+            impersonate="chrome",
+            http_version=curl_cffi.CurlHttpVersion.V2TLS,
+            max_clients=_MAX_CLIENTS,
+        ) as session,
+        AsyncSession(
+            impersonate="chrome",
+            max_clients=_IMG_MAX_CLIENTS,
+            cookies=_NoCookieJar(),
+        ) as img_session,
+    ):
+        yield {"session": session, "img_session": img_session}
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    # If-None-Match uses the weak comparison
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+@functools.lru_cache(maxsize=256)
+def _accepts_gzip(accept_encoding: str) -> bool:
+    qvalues: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        qvalue = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    qvalue = math.nan
+        # ignore entries with malformed, non-finite or out of range q values
+        if 0 <= qvalue <= 1:
+            qvalues[coding.strip().lower()] = qvalue
+    # an explicit gzip entry takes precedence over the wildcard
+    return qvalues.get("gzip", qvalues.get("*", 0.0)) > 0
+
+
+def _page_response(
+    template: jinja2.Template, request: Request, media_type: str, **context: object
+) -> Response:
+    # the context has to be the same for every request of a template
+    key = (template.name or "", str(request.base_url))
+    if (page := _PAGE_CACHE.get(key)) is None:
+        content = template.render(request=request, **context).encode()
+        # weak as the plain and the gzipped body share the tag
+        etag = f'W/"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+        headers = {"ETag": etag, **_PAGE_HEADERS}
+        page = _Page(
+            content,
+            gzip.compress(content),
+            headers,
+            {"Content-Encoding": "gzip", **headers},
+        )
+        _PAGE_CACHE[key] = page
+        if len(_PAGE_CACHE) > _PAGE_CACHE_SIZE:
+            _PAGE_CACHE.popitem(last=False)
+    else:
+        _PAGE_CACHE.move_to_end(key)
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None and _etag_matches(page.headers["ETag"], if_none_match):
+        return Response(status_code=304, headers=page.headers)
+
+    if _accepts_gzip(request.headers.get("Accept-Encoding", "")):
+        return Response(page.gzipped, headers=page.gzip_headers, media_type=media_type)
+    return Response(page.content, headers=page.headers, media_type=media_type)
+
+
+@functools.lru_cache(maxsize=256)
+def _media_types(accept: str) -> frozenset[str]:
+    return frozenset(part.split(";", 1)[0].strip() for part in accept.split(","))
 
 
 def http_exception(request: Request, exc: HTTPException) -> Response:
     """Handle HTTP exceptions."""
     if "HX-Request" in request.headers:
-        return _TEMPLATES.TemplateResponse(
-            request,
-            "error.html",
-            {
-                "base": "htmx.html",
-                "title": _("Error"),
-                "error_message": exc.detail,
-            },
-            headers={"HX-Retarget": "#target", "HX-Reswap": "outerHTML"},
+        return HTMLResponse(
+            _ERROR_TEMPLATE.render(
+                request=request,
+                base="htmx.html",
+                title=_ERROR_TITLE,
+                error_message=exc.detail,
+            ),
+            headers=_HX_ERROR_HEADERS,
         )
-    if "text/html" in request.headers.get("Accept", ""):
-        return _TEMPLATES.TemplateResponse(
-            request,
-            "error.html",
-            {
-                "base": "base.html",
-                "title": _("Error"),
-                "error_message": exc.detail,
-            },
+    if "text/html" in _media_types(request.headers.get("Accept", "")):
+        return HTMLResponse(
+            _ERROR_TEMPLATE.render(
+                request=request,
+                base="base.html",
+                title=_ERROR_TITLE,
+                error_message=exc.detail,
+            ),
             exc.status_code,
         )
     return Response(exc.detail, exc.status_code, media_type="text/plain")
 
 
-def index(request: Request) -> HTMLResponse:
+def index(request: Request) -> Response:
     """Return the start page."""
-    return _TEMPLATES.TemplateResponse(
+    return _page_response(
+        _INDEX_TEMPLATE,
         request,
-        "index.html",
-        {"form_base": "base.html", "title": _("Search")},
-        headers={"Cache-Control": f"max-age={MAX_AGE}"},
+        "text/html",
+        form_base="base.html",
+        title=_("Search"),
     )
 
 
@@ -99,8 +256,8 @@ def _parse_params(request: Request) -> tuple[str, SearchMode, int]:
         raise HTTPException(400, _("The search term is empty"))
 
     try:
-        mode = SearchMode(request.query_params["mode"])
-    except (ValueError, KeyError) as e:
+        mode = _SEARCH_MODES[request.query_params["mode"]]
+    except KeyError as e:
         raise HTTPException(400, _("Invalid search mode")) from e
 
     try:
@@ -115,53 +272,61 @@ def search(request: Request) -> Response:
     """Perform a search and return the search result page."""
     query, mode, page = _parse_params(request)
 
-    return _TEMPLATES.TemplateResponse(
-        request,
-        "search.html",
-        {
-            "form_base": "htmx.html"
-            if "HX-Request" in request.headers
-            else "base.html",
-            "title": query,
-            "query": query,
-            "mode": mode,
-            "page": page,
-            "load": True,
-        },
-        headers={"Cache-Control": f"max-age={MAX_AGE}"},
+    return HTMLResponse(
+        _SEARCH_TEMPLATE.render(
+            request=request,
+            form_base="htmx.html" if "HX-Request" in request.headers else "base.html",
+            title=query,
+            query=query,
+            mode=mode,
+            page=page,
+            load=True,
+        ),
+        headers=_CACHE_HEADERS,
     )
 
 
 async def results(request: Request) -> Response:
     """Perform a search and return the search result page."""
     query, mode, page = _parse_params(request)
-
+    htmx = "HX-Request" in request.headers
     parsed_query = _QUERY_PARSER.parse_query(
         query, request.headers.get("Accept-Language", "")
     )
 
+    # the page only depends on the language parsed from the Accept-Language header
+    cache_key = (str(request.base_url), query, mode, page, parsed_query.lang, htmx)
+    if (cached := _RESULTS_CACHE.get(cache_key)) is not None:
+        if cached.expires > time.monotonic():
+            _RESULTS_CACHE.move_to_end(cache_key)
+            return HTMLResponse(cached.content, headers=_RESULTS_HEADERS)
+        del _RESULTS_CACHE[cache_key]
+
     rated_results, errors = await perform_search(
         request.state.session, parsed_query, mode, page
     )
 
-    return _TEMPLATES.TemplateResponse(
-        request,
-        "results.html",
-        {
-            "form_base": None if "HX-Request" in request.headers else "base.html",
-            "results_base": "htmx.html"
-            if "HX-Request" in request.headers
-            else "search.html",
-            "title": query,
-            "query": query,
-            "mode": mode,
-            "page": page,
-            "parsed_query": parsed_query,
-            "results": rated_results,
-            "engine_errors": errors,
-        },
-        headers={"Vary": "Accept-Language", "Cache-Control": f"max-age={MAX_AGE}"},
-    )
+    content = _RESULTS_TEMPLATE.render(
+        request=request,
+        form_base=None if htmx else "base.html",
+        results_base="htmx.html" if htmx else "search.html",
+        title=query,
+        query=query,
+        mode=mode,
+        page=page,
+        parsed_query=parsed_query,
+        results=rated_results,
+        engine_errors=errors,
+    ).encode()
+
+    # don't keep pages listing failed engines, reloading may succeed next time
+    if not errors:
+        _RESULTS_CACHE[cache_key] = _CachedResults(time.monotonic() + MAX_AGE, content)
+        _RESULTS_CACHE.move_to_end(cache_key)
+        if len(_RESULTS_CACHE) > _RESULTS_CACHE_SIZE:
+            _RESULTS_CACHE.popitem(last=False)
+
+    return HTMLResponse(content, headers=_RESULTS_HEADERS)
 
 
 async def img(request: Request) -> Response:
@@ -171,33 +336,48 @@ async def img(request: Request) -> Response:
         raise HTTPException(404, "Not Found")
 
     sha = request.query_params.get("sha", None)
-    if sha is None or gen_sha(url) != sha:
+    # compare bytes, compare_digest rejects non-ASCII str
+    if sha is None or not hmac.compare_digest(gen_sha(url).encode(), sha.encode()):
         raise HTTPException(401, "Unauthorized")
 
-    async with AsyncSession(impersonate="chrome") as session:
-        try:
-            resp = await session.get(url, headers={"Accept": "image/*"})
-        except curl_cffi.CurlError as e:
-            raise HTTPException(500, str(e)) from e
+    try:
+        resp = await request.state.img_session.get(
+            url, headers={"Accept": "image/*"}, stream=True
+        )
+    except curl_cffi.CurlError as e:
+        raise HTTPException(500, str(e)) from e
 
-    if not HTTPStatus(resp.status_code).is_success:
+    if not 200 <= resp.status_code < 300:
+        await resp.aclose()
         raise HTTPException(resp.status_code, resp.reason)
 
     if not resp.headers.get("Content-Type", "").startswith("image/"):
+        await resp.aclose()
         raise HTTPException(500, "Not an image")
 
-    return Response(
-        content=resp.content,
+    headers = _IMG_HEADERS
+    # curl decodes compressed bodies, so the length only holds for plain ones
+    if "Content-Length" in resp.headers and "Content-Encoding" not in resp.headers:
+        headers = {"Content-Length": resp.headers["Content-Length"], **headers}
+
+    return StreamingResponse(
+        resp.aiter_content(),
         media_type=resp.headers["Content-Type"],
-        headers={"Cache-Control": f"max-age={MAX_AGE * 10}"},
+        headers=headers,
+        background=BackgroundTask(resp.aclose),
     )
 
 
-def opensearch(request: Request) -> HTMLResponse:
+def opensearch(request: Request) -> Response:
     """Return opensearch.xml."""
-    return _TEMPLATES.TemplateResponse(
-        request, "opensearch.xml", media_type="application/xml"
-    )
+    return _page_response(_OPENSEARCH_TEMPLATE, request, "application/xml")
+
+
+class _StaticFiles(StaticFiles):
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        response.headers.update(_CACHE_HEADERS)
+        return response
 
 
 app = Starlette(
@@ -208,7 +388,7 @@ app = Starlette(
         Route("/results", endpoint=results),
         Route("/img", endpoint=img),
         Route("/opensearch.xml", endpoint=opensearch),
-        Mount("/static", app=StaticFiles(directory="static"), name="static"),
+        Mount("/static", app=_StaticFiles(directory="static"), name="static"),
     ],
     exception_handlers={HTTPException: http_exception},
 )
@@ -3,23 +3,24 @@
 from . import importer  # isort: skip
 
 import asyncio
+import functools
 import json
 from abc import ABC, abstractmethod
+from collections.abc import Callable
 from enum import Flag, auto
 from html import unescape
-from http import HTTPStatus
 from types import ModuleType
-from typing import Literal, Optional, TypedDict
+from typing import Any, Literal, Optional, TypedDict
 from urllib.parse import urlencode, urljoin
 
 import jsonpath_ng
-import jsonpath_ng.ext
 import searx
 import searx.data
 import searx.enginelib
 import searx.engines
 from curl_cffi.requests import AsyncSession, Response
 from curl_cffi.requests.session import HttpMethod
+from jsonpath_ng.jsonpath import Child, Fields, Index, Slice
 from lxml import etree, html
 
 from .query import ParsedQuery, SearchMode
@@ -147,7 +148,7 @@ class Engine(ABC):
             cookies=params["cookies"],
         )
 
-        if not HTTPStatus(response.status_code).is_success:
+        if not 200 <= response.status_code < 300:
             raise StatusCodeError(response)
 
         response.search_params = params
@@ -161,6 +162,9 @@ class Engine(ABC):
 
 _DEFAULT_PARAMS: dict[str, str] = {}
 
+# results further down barely affect the rating, so don't bother extracting them
+_MAX_RESULTS = 20
+
 
 class _CstmEngine[Path, Element](Engine):
     def __init__(
@@ -187,6 +191,8 @@ class _CstmEngine[Path, Element](Engine):
         self._url = url
         self._query_key = query_key
         self._params = params
+        # static part of the query string, appended after the search term
+        self._query_suffix = f"&{urlencode(params)}" if params else ""
         self._result_path = result_path
         self._title_path = title_path
         self._url_path = url_path
@@ -221,13 +227,12 @@ class _CstmEngine[Path, Element](Engine):
         pass
 
     def _request(self, query: ParsedQuery, params: _Params) -> _Params:
-        data = {self._query_key: str(query), **self._params}
-
         if self._method == "GET":
-            params["url"] = f"{self._url}?{urlencode(data)}"
+            query_string = urlencode({self._query_key: str(query)})
+            params["url"] = f"{self._url}?{query_string}{self._query_suffix}"
         elif self._method == "POST":
             params["url"] = self._url
-            params["data"] = json.dumps(data)
+            params["data"] = json.dumps({self._query_key: str(query), **self._params})
         else:
             msg = f"Unsupported method {self._method}"
             raise ValueError(msg)
@@ -240,8 +245,12 @@ class _CstmEngine[Path, Element](Engine):
         results: list[Result] = []
 
         for result in self._iter(root, self._result_path):
+            if len(results) >= _MAX_RESULTS:
+                break
+
             title = self._get(result, self._title_path)
-            assert title
+            if not title:
+                continue
 
             _url = self._get(result, self._url_path)
             assert _url
@@ -260,10 +269,29 @@ class _CstmEngine[Path, Element](Engine):
         return results
 
 
+_HTML_PARSER = html.HTMLParser(collect_ids=False, remove_comments=True, remove_pis=True)
+
+
+# the encoding comes from the response, only a handful of real ones are expected
+@functools.lru_cache(maxsize=16)
+def _html_parser(encoding: str) -> Optional[html.HTMLParser]:
+    try:
+        return html.HTMLParser(
+            encoding=encoding, collect_ids=False, remove_comments=True, remove_pis=True
+        )
+    except LookupError:
+        # libxml2 doesn't know every charset python does
+        return None
+
+
 class _XPathEngine(_CstmEngine[etree.XPath, html.HtmlElement]):
     @staticmethod
     def _parse_response(response: Response) -> html.HtmlElement:
-        return html.document_fromstring(response.text)
+        if not response.encoding:
+            return html.document_fromstring(response.content, parser=_HTML_PARSER)
+        if (parser := _html_parser(response.encoding)) is None:
+            return html.document_fromstring(response.text, parser=_HTML_PARSER)
+        return html.document_fromstring(response.content, parser=parser)
 
     @staticmethod
     def _iter(root: html.HtmlElement, path: etree.XPath) -> list[html.HtmlElement]:
@@ -274,33 +302,71 @@ class _XPathEngine(_CstmEngine[etree.XPath, html.HtmlElement]):
         if path is None or not (elems := path(root)):
             return ""
         if isinstance(elems[0], str):
-            return elems[0]
-        return html.tostring(
-            elems[0],
-            encoding="unicode",
-            method="text",
-            with_tail=False,
+            # drop the smart string's reference to its (cached) document tree
+            return str(elems[0])
+        return elems[0].text_content()
+
+
+type _JSONPath = Callable[[Any], list[Any]]
+
+
+def _compile_json_path(path: jsonpath_ng.JSONPath) -> _JSONPath:
+    """Turn a JSONPath into a function returning the values it matches."""
+    # fields, children and full slices are resolved without wrapping every match,
+    # anything else is left to jsonpath_ng
+    if isinstance(path, Fields) and len(path.fields) == 1 and path.fields[0] != "*":
+        field = path.fields[0]
+        return lambda value: (
+            [value[field]] if isinstance(value, dict) and field in value else []
+        )
+
+    if isinstance(path, Child):
+        left = _compile_json_path(path.left)
+        right = _compile_json_path(path.right)
+        return lambda value: [match for inner in left(value) for match in right(inner)]
+
+    if (
+        isinstance(path, Slice)
+        and path.start is None
+        and path.end is None
+        and path.step is None
+    ):
+        return lambda value: (
+            value
+            if isinstance(value, list)
+            else [match.value for match in path.find(value)]
         )
 
+    if isinstance(path, Index):
+        # jsonpath_ng fails to index objects and numbers, let them match nothing
+        return lambda value: (
+            [match.value for match in path.find(value)]
+            if isinstance(value, list | str)
+            else []
+        )
 
-class _JSONEngine(_CstmEngine[jsonpath_ng.JSONPath, jsonpath_ng.DatumInContext]):
+    return lambda value: [match.value for match in path.find(value)]
+
+
+class _JSONEngine(_CstmEngine[_JSONPath, Any]):
     @staticmethod
-    def _parse_response(response: Response) -> jsonpath_ng.DatumInContext:
-        return jsonpath_ng.Root().find(response.json())
+    def _parse_response(response: Response) -> Any:
+        return json.loads(response.content)
 
     @staticmethod
-    def _iter(
-        root: jsonpath_ng.DatumInContext, path: jsonpath_ng.JSONPath
-    ) -> list[jsonpath_ng.DatumInContext]:
-        return path.find(root)
+    def _iter(root: Any, path: _JSONPath) -> list[Any]:
+        return path(root)
 
     @staticmethod
-    def _get(
-        root: jsonpath_ng.DatumInContext, path: Optional[jsonpath_ng.JSONPath]
-    ) -> str:
-        if path is None or not (elems := path.find(root)):
+    def _get(root: Any, path: Optional[_JSONPath]) -> str:
+        if path is None or not (values := path(root)):
             return ""
-        return elems[0].value
+        return values[0]
+
+
+_IGNORED_RESULT_KEYS = frozenset(
+    {"suggestion", "correction", "infobox", "number_of_results", "engine_data"}
+)
 
 
 class _SearxEngine(Engine):
@@ -423,19 +489,13 @@ class _SearxEngine(Engine):
         return WebResult(title, url, self._parse_content(result))
 
     def _response(self, response: Response) -> list[Result]:
-        if not response.text:
+        if not response.content:
             return []
 
         results: list[Result] = []
 
         for result in self._engine.response(response):
-            if (
-                "suggestion" in result
-                or "correction" in result
-                or "infobox" in result
-                or "number_of_results" in result
-                or "engine_data" in result
-            ):
+            if not _IGNORED_RESULT_KEYS.isdisjoint(result):
                 continue
 
             if "answer" in result:
@@ -478,29 +538,43 @@ _ENGINES = {
         features=_Features.SITE,
         url="https://se-proxy.azurewebsites.net/api/search",
         params={"slice": "0:12"},
-        result_path=jsonpath_ng.ext.parse("'结果'[?'信息'.'标题' != '']"),
-        url_path=jsonpath_ng.parse("'网址'"),
-        title_path=jsonpath_ng.parse("'信息'.'标题'"),
-        text_path=jsonpath_ng.parse("'信息'.'描述'"),
+        result_path=_compile_json_path(Child(Fields("结果"), Slice())),
+        url_path=_compile_json_path(Fields("网址")),
+        title_path=_compile_json_path(Child(Fields("信息"), Fields("标题"))),
+        text_path=_compile_json_path(Child(Fields("信息"), Fields("描述"))),
     ),
     _SearxEngine("stract", features=_Features.QUOTES | _Features.SITE),
     _SearxEngine("yep", features=_Features.SITE),
     _SearxEngine("yep", mode=SearchMode.IMAGES, features=_Features.SITE),
 }
 
+ENGINE_COUNT = len(_ENGINES)
+
 
-def get_engines(query: ParsedQuery, mode: SearchMode, page: int) -> set[Engine]:
-    """Return list of enabled engines for the language."""
-    return {
-        engine
-        for engine in _ENGINES
-        if engine.mode == mode
-        if engine.supports_language(query.lang)
-        if _Features.required(query, page)
-        in engine.features
-        | (
+def get_engines(
+    query: ParsedQuery, mode: SearchMode, page: int
+) -> tuple[frozenset[Engine], frozenset[Engine]]:
+    """Return the enabled engines split into important and other engines."""
+    return _get_engines(mode, query.lang, query.site, _Features.required(query, page))
+
+
+# the selection only depends on a few query properties, most searches share them
+@functools.lru_cache(maxsize=256)
+def _get_engines(
+    mode: SearchMode, lang: str, site: Optional[str], required: _Features
+) -> tuple[frozenset[Engine], frozenset[Engine]]:
+    important: set[Engine] = set()
+    others: set[Engine] = set()
+    for engine in _ENGINES:
+        if engine.mode != mode or not engine.supports_language(lang):
+            continue
+        features = engine.features | (
             _Features.SITE
-            if query.site == Url.parse(engine.url).netloc.removeprefix("www.")
+            if site == Url.parse(engine.url).netloc.removeprefix("www.")
             else _Features(0)
         )
-    }
+        if required not in features:
+            continue
+        (important if engine.weight > 1 else others).add(engine)
+
+    return frozenset(important), frozenset(others)
@@ -1,32 +1,67 @@
 """Module containing utils to work with human language."""
 
+import functools
+import threading
+from typing import TYPE_CHECKING
+
 import regex
 import searx.utils
 
+if TYPE_CHECKING:
+    import fasttext
 
-def detect_lang(text: str, languages: list[str]) -> str:
-    """Detect language of given text, returning ISO language code."""
-    model = searx.utils._get_fasttext_model()  # noqa: SLF001
+# the model is preloaded in a background thread at startup, which may race the
+# first request; searx doesn't guard against loading it twice
+_MODEL_LOCK = threading.Lock()
+
+
+def _get_model() -> "fasttext.FastText._FastText":
+    with _MODEL_LOCK:
+        return searx.utils._get_fasttext_model()  # noqa: SLF001
+
+
+def load_model() -> None:
+    """Load the language detection model ahead of its first use."""
+    _get_model()
+
+
+_LABEL_PREFIX_LEN = len("__label__")
+
+
+@functools.lru_cache(maxsize=1024)
+def _predict_langs(text: str) -> tuple[str, ...]:
+    model = _get_model()
     labels, _ = model.predict(" ".join(text.splitlines()), 176)
+    return tuple(label[_LABEL_PREFIX_LEN:] for label in labels)
 
-    langs = [
-        lang
-        for label in labels
-        if (lang := label.removeprefix("__label__")) in languages
-    ] + languages
 
-    return langs[0]
+def detect_lang(text: str, languages: list[str]) -> str:
+    """Detect language of given text, returning ISO language code."""
+    # the detected language is always one of the given ones
+    if len(languages) == 1:
+        return languages[0]
 
+    # numbers, symbols and very short words carry no reliable language signal
+    if not any(char.isalpha() for char in text) or (text.isascii() and len(text) < 4):
+        return languages[0]
 
-def is_lang(text: str, expected_lang: str) -> float:
-    """Check to which confidence score the given text matches the expected language."""
-    model = searx.utils._get_fasttext_model()  # noqa: SLF001
-    labels, scores = model.predict(" ".join(text.splitlines()), 176)
+    return next(
+        (lang for lang in _predict_langs(text) if lang in languages), languages[0]
+    )
 
-    if f"__label__{expected_lang}" in labels:
-        return scores[labels.index(f"__label__{expected_lang}")]
 
-    return 0.0
+def is_lang(texts: list[str], expected_lang: str) -> list[float]:
+    """Check to which confidence scores the given texts match the expected language."""
+    model = _get_model()
+    all_labels, all_scores = model.predict(
+        [" ".join(text.splitlines()) for text in texts], 176
+    )
+
+    expected_label = f"__label__{expected_lang}"
+    return [
+        scores[labels.index(expected_label)] if expected_label in labels else 0.0
+        for labels, scores in zip(all_labels, all_scores, strict=True)
+    ]
 
 
 # RFC 4234
@@ -81,9 +116,15 @@ _Accept_Language = regex.compile(
 )
 
 
-def parse_accept_language(value: str) -> list[str]:
-    """Parse an Accept-Language header returning the list of languages."""
+# browsers send the same few headers over and over again
+@functools.lru_cache(maxsize=1024)
+def _parse_accept_language(value: str) -> tuple[str, ...]:
     match = _Accept_Language.match(value)
     if match is None:
-        return []
-    return list(dict.fromkeys(match.captures("lang")))
+        return ()
+    return tuple(dict.fromkeys(match.captures("lang")))
+
+
+def parse_accept_language(value: str) -> list[str]:
+    """Parse an Accept-Language header returning the list of languages."""
+    return list(_parse_accept_language(value))
@@ -25,20 +25,19 @@ def _create_tables(con: sqlite3.Connection) -> None:
     """)
 
 
-def metric_success(engine: Engine, result_count: int, time: float) -> None:
-    """Store success metrics in database."""
+def store_metrics(
+    successes: dict[Engine, tuple[int, float]], errors: dict[Engine, Exception]
+) -> None:
+    """Store success and error metrics of a search in database."""
     with contextlib.closing(sqlite3.connect("metrics.db")) as con, con:
         _create_tables(con)
-        con.execute(
+        con.executemany(
             "INSERT INTO success (engine, result_count, time) VALUES (?, ?, ?)",
-            (str(engine), result_count, time),
+            [
+                (str(engine), result_count, time)
+                for engine, (result_count, time) in successes.items()
+            ],
         )
-
-
-def metric_errors(errors: dict[Engine, Exception]) -> None:
-    """Store engine error metrics in database."""
-    with contextlib.closing(sqlite3.connect("metrics.db")) as con, con:
-        _create_tables(con)
         con.executemany(
             "INSERT INTO error (engine, error) VALUES (?, ?)",
             [
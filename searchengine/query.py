@@ -17,13 +17,14 @@ class SearchMode(Enum):
 
     def searx_category(self) -> str:
         """Convert search mode to searx category."""
-        if self == SearchMode.WEB:
-            return "general"
-        if self == SearchMode.IMAGES:
-            return "images"
-        if self == SearchMode.SCHOLAR:
-            return "science"
-        raise ValueError
+        return _SEARX_CATEGORIES[self]
+
+
+_SEARX_CATEGORIES = {
+    SearchMode.WEB: "general",
+    SearchMode.IMAGES: "images",
+    SearchMode.SCHOLAR: "science",
+}
 
 
 class ParsedQuery(NamedTuple):
@@ -35,18 +36,12 @@ class ParsedQuery(NamedTuple):
 
     def __str__(self) -> str:
         """Convert query parts to query string."""
-        query = ""
-
-        for word in self.words:
-            if " " in word:
-                query += f'"{word}" '
-            else:
-                query += f"{word} "
+        parts = [f'"{word}"' if " " in word else word for word in self.words]
 
         if self.site is not None:
-            query += f"site:{self.site} "
+            parts.append(f"site:{self.site}")
 
-        return query[:-1]
+        return " ".join(parts)
 
 
 class QueryParser:
@@ -81,19 +76,22 @@ class QueryParser:
 
     def parse_query(self, query: str, accept_language: str) -> ParsedQuery:
         """Parse a search query into a (words, lang, site) tuple."""
-        self.lexer.input(query)
-
         words = []
         lang = None
         site = None
 
-        while token := self.lexer.token():
-            if token.type == "LANG":
-                lang = token.value
-            elif token.type == "SITE":
-                site = token.value
-            else:
-                words.append(token.value)
+        # w/o colons and quotes there can only be plain words
+        if ":" not in query and '"' not in query:
+            words = [word for word in query.split(" ") if word]
+        else:
+            self.lexer.input(query)
+            for token in self.lexer:
+                if token.type == "LANG":
+                    lang = token.value
+                elif token.type == "SITE":
+                    site = token.value
+                else:
+                    words.append(token.value)
 
         if lang is None:
             languages = parse_accept_language(accept_language)
@@ -1,6 +1,8 @@
 """Module for rating results."""
 
+import functools
 import heapq
+from urllib.parse import parse_qsl, urlencode
 
 import regex
 
@@ -10,19 +12,50 @@ from .results import AnswerResult, ImageResult, Result, WebResult
 from .url import Url
 
 with open("domains.txt") as file:
-    _SPAM_DOMAINS = {x.removeprefix("www.") for x in file if not x.startswith("#")}
+    _SPAM_DOMAINS = frozenset(
+        x.strip().removeprefix("www.")
+        for x in file
+        if x.strip() and not x.startswith("#")
+    )
+
+
+_MAX_RESULTS = 12
+
+_HAN = regex.compile(r"\p{Han}")
+
+_HOST_BONUS = {
+    "reddit.com": 2,
+    "docs.python.org": 1.5,
+    "stackoverflow.com": 1.5,
+    "github.com": 1.5,
+}
+
+_TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "yclid"}
 
 
+def _is_tracking_param(key: str) -> bool:
+    return key.startswith("utm_") or key in _TRACKING_PARAMS
+
+
+@functools.lru_cache(maxsize=4096)
 def _comparable_url(url: Url) -> Url:
     assert url.scheme in {"http", "https"}
+    host = url.host.lower()
     return url._replace(
         scheme="http",
-        netloc=url.host.removeprefix("www.").replace(
-            ".m.wikipedia.org", ".wikipedia.org"
-        ),
+        netloc=host.removeprefix("www.").replace(".m.wikipedia.org", ".wikipedia.org"),
         path=url.path.replace("%E2%80%93", "-")
-        if url.host.endswith(".wikipedia.org")
+        if host.endswith(".wikipedia.org")
         else url.path,
+        query=urlencode(
+            [
+                (key, value)
+                for key, value in parse_qsl(url.query, keep_blank_values=True)
+                if not _is_tracking_param(key)
+            ]
+        )
+        if url.query
+        else "",
         fragment="",
     )
 
@@ -30,28 +63,33 @@ def _comparable_url(url: Url) -> Url:
 class RatedResult:
     """Combined result with a rating and set of engines associated."""
 
+    __slots__ = ("_max_weight", "_url", "engines", "rating", "result", "text")
+
     def __init__(self, result: Result, rating: float, engine: Engine) -> None:
         """Initialize empty rated result."""
         self.result = result
         self.rating = rating * engine.weight
         self.engines = {engine}
+        self._max_weight = engine.weight
 
         if isinstance(result, WebResult | ImageResult):
-            self._text = result.title
+            self._url = _comparable_url(result.url)
+            self.text = result.title
             if result.text is not None:
-                self._text += " " + result.text
+                self.text += " " + result.text
         else:
             assert isinstance(result, AnswerResult)
-            self._text = result.answer
+            self._url = None
+            self.text = result.answer
 
     def update(self, result: Result, rating: float, engine: Engine) -> bool:
         """Update rated result by combining the result from another engine."""
         if isinstance(result, AnswerResult) or isinstance(self.result, AnswerResult):
             return False
-        if _comparable_url(self.result.url) != _comparable_url(result.url):
+        if self._url != _comparable_url(result.url):
             return False
 
-        max_weight = max(e.weight for e in self.engines)
+        max_weight = self._max_weight
 
         if isinstance(self.result, ImageResult) and isinstance(result, WebResult):
             self.result = WebResult(
@@ -83,26 +121,25 @@ class RatedResult:
         if engine not in self.engines:
             self.rating += rating * engine.weight
             self.engines.add(engine)
+            self._max_weight = max(max_weight, engine.weight)
 
-        assert self._text
-        self._text += " " + result.title
+        assert self.text
+        self.text += " " + result.title
         if result.text is not None:
-            self._text += " " + result.text
+            self.text += " " + result.text
 
         return True
 
-    def eval(self, lang: str) -> None:
+    def eval(self, lang: str, lang_score: float) -> None:
         """Run additional result evaluation and update rating."""
-        if lang != "zh" and regex.search(r"\p{Han}", self._text):
+        if lang != "zh" and _HAN.search(self.text):
             self.rating *= 0.5
         else:
-            self.rating *= (is_lang(self._text, lang) + 1) / 2
+            self.rating *= (lang_score + 1) / 2
 
         host = self.result.url.host.removeprefix("www.")
-        if host == "reddit.com":
-            self.rating *= 2
-        elif host in {"docs.python.org", "stackoverflow.com", "github.com"}:
-            self.rating *= 1.5
+        if host in _HOST_BONUS:
+            self.rating *= _HOST_BONUS[host]
         elif host.endswith(".wikipedia.org"):
             self.rating *= 1.25
         elif host in _SPAM_DOMAINS:
@@ -128,18 +165,29 @@ class RatedResult:
 
 def rate_results(results: dict[Engine, list[Result]], lang: str) -> list[RatedResult]:
     """Combine results from all engines and rate them."""
-    rated_results: set[RatedResult] = set()
+    web_results: dict[Url, RatedResult] = {}
+    answer_results: list[RatedResult] = []
 
     for engine, result_list in results.items():
         for i, result in enumerate(result_list):
             rating = (1.25**-i) * 10
-            for rated_result in rated_results:
-                if rated_result.update(result, rating, engine):
-                    break
+
+            if isinstance(result, AnswerResult):
+                answer_results.append(RatedResult(result, rating, engine))
+                continue
+
+            url = _comparable_url(result.url)
+            if url in web_results:
+                web_results[url].update(result, rating, engine)
             else:
-                rated_results.add(RatedResult(result, rating, engine))
+                web_results[url] = RatedResult(result, rating, engine)
+
+    rated_results = [*web_results.values(), *answer_results]
+    if not rated_results:
+        return []
 
-    for rated_result in rated_results:
-        rated_result.eval(lang)
+    lang_scores = is_lang([rated_result.text for rated_result in rated_results], lang)
+    for rated_result, lang_score in zip(rated_results, lang_scores, strict=True):
+        rated_result.eval(lang, lang_score)
 
-    return heapq.nlargest(12, rated_results)
+    return heapq.nlargest(_MAX_RESULTS, rated_results)
@@ -2,12 +2,14 @@
 
 import asyncio
 import traceback
+from collections.abc import Callable
+from typing import Optional
 
 import aiocache
 from curl_cffi.requests import AsyncSession
 
 from .engines import Engine, get_engines
-from .metrics import metric_errors, metric_success
+from .metrics import store_metrics
 from .query import ParsedQuery, SearchMode
 from .rate import RatedResult, rate_results
 from .results import Result
@@ -15,7 +17,17 @@ from .results import Result
 MAX_AGE = 60 * 60
 
 
-@aiocache.cached(noself=True, ttl=MAX_AGE)
+def _engine_search_key(
+    _func: Callable,
+    _session: AsyncSession,
+    engine: Engine,
+    query: ParsedQuery,
+    page: int,
+) -> tuple[Engine, tuple[str, ...], str, Optional[str], int]:
+    return engine, tuple(query.words), query.lang, query.site, page
+
+
+@aiocache.cached(ttl=MAX_AGE, key_builder=_engine_search_key)
 async def _engine_search(
     session: AsyncSession, engine: Engine, query: ParsedQuery, page: int
 ) -> tuple[list[Result], float]:
@@ -25,22 +37,36 @@ async def _engine_search(
     return results, loop.time() - start
 
 
+def _report(
+    successes: dict[Engine, tuple[int, float]], errors: dict[Engine, Exception]
+) -> None:
+    for exc in errors.values():
+        # timeouts are created when cancelling and have no traceback to show
+        if exc.__traceback__ is not None:
+            traceback.print_exception(exc)
+    store_metrics(successes, errors)
+
+
 async def perform_search(
     session: AsyncSession, query: ParsedQuery, mode: SearchMode, page: int
 ) -> tuple[list[RatedResult], dict[Engine, Exception]]:
     """Perform a search for the given query."""
-    engines = get_engines(query, mode, page)
+    important, others = get_engines(query, mode, page)
 
     results = {}
+    successes = {}
     errors = {}
 
-    tasks = {
+    prio_tasks = {
         asyncio.create_task(_engine_search(session, engine, query, page)): engine
-        for engine in engines
+        for engine in important
+    }
+    tasks = prio_tasks | {
+        asyncio.create_task(_engine_search(session, engine, query, page)): engine
+        for engine in others
     }
 
-    prio_tasks = {task for task, engine in tasks.items() if engine.weight > 1}
-    await asyncio.wait(prio_tasks)
+    await asyncio.wait(prio_tasks.keys())
     max_time = max(task.result()[1] for task in prio_tasks)
 
     await asyncio.wait(tasks.keys(), timeout=max(max_time * 0.5, 1 - max_time))
@@ -48,17 +74,19 @@ async def perform_search(
         if task.done():
             if (exc := task.exception()) is None:
                 engine_results, time = task.result()
-                metric_success(engine, len(engine_results), time)
+                successes[engine] = len(engine_results), time
                 results[engine] = engine_results
             else:
-                traceback.print_exception(exc)
                 errors[engine] = exc
         else:
             task.cancel()
             errors[engine] = TimeoutError()
 
-    metric_errors(errors)
+    # report in a thread so the stderr and sqlite I/O overlaps with rating results
+    report = asyncio.create_task(asyncio.to_thread(_report, successes, errors))
 
     rated_results = rate_results(results, query.lang)
 
+    await report
+
     return rated_results, errors
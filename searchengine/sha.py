@@ -1,11 +1,15 @@
 """SHA hash function for proxy URLs."""
 
+import functools
 import hashlib
 import secrets
 
 _SECRET = secrets.token_bytes(32)
 
 
+# the proxy filter signs every image of a results page and the browser then
+# sends the same URLs back to the img endpoint
+@functools.lru_cache(maxsize=4096)
 def gen_sha(url: str) -> str:
     """Return a SHA-256 hash of the URL with a secret key."""
     return hashlib.sha256(_SECRET + url.encode()).hexdigest()
@@ -60,7 +60,24 @@ def _proxy(ctx: dict[str, Any], url: Url) -> str:
 
 
 def _pretty_exc(exc: Exception) -> str:
-    return traceback.format_exception_only(exc)[0]
+    # only syntax errors get extra lines with the offending source
+    if isinstance(exc, SyntaxError):
+        return traceback.format_exception_only(exc)[0]
+
+    exc_type = type(exc)
+    name = exc_type.__qualname__
+    if exc_type.__module__ not in {"__main__", "builtins"}:
+        name = f"{exc_type.__module__}.{name}"
+
+    # same fallback as traceback for exceptions with a broken __str__
+    try:
+        message = str(exc)
+    except Exception:  # noqa: BLE001
+        message = "<exception str() failed>"
+
+    if message:
+        return f"{name}: {message}\n"
+    return f"{name}\n"
 
 
 TEMPLATE_FILTER_MAP = {
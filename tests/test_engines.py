@@ -1,9 +1,19 @@
 """Tests to test the engines."""
 
+from types import SimpleNamespace
+from typing import Any
+
+import jsonpath_ng
 import pydantic
 import pytest
 from curl_cffi.requests import AsyncSession
-from searchengine.engines import _ENGINES, Engine, _Params
+from searchengine.engines import (
+    _ENGINES,
+    Engine,
+    _compile_json_path,
+    _Params,
+    _XPathEngine,
+)
 from searchengine.query import ParsedQuery
 
 _Params.__pydantic_config__ = pydantic.ConfigDict(  # type: ignore[attr-defined]
@@ -35,3 +45,47 @@ async def test_request(engine: Engine) -> None:
 
     with pytest.raises(_ExitEarlyError):
         await engine.search(_SESSION, _QUERY, 1)
+
+
+@pytest.mark.parametrize(
+    ("encoding", "text"),
+    [
+        ("utf-8", "Grüße"),
+        ("latin-1", "Grüße"),
+        ("euc-kr", "안녕하세요"),
+        ("utf-8-sig", "Grüße"),
+    ],
+)
+def test_parse_html(encoding: str, text: str) -> None:
+    """Test that HTML is decoded using the charset of the response."""
+    content = f"<html><body><p>{text}</p></body></html>".encode(encoding)
+    response = SimpleNamespace(
+        content=content, encoding=encoding, text=content.decode(encoding)
+    )
+    root = _XPathEngine._parse_response(response)  # type: ignore[arg-type]
+    assert root.body.text_content() == text
+
+
+@pytest.mark.parametrize("path", ["a", "a.b", "a[*]", "a[*].b", "a[0]", "*"])
+@pytest.mark.parametrize(
+    "value",
+    [
+        {"a": {"b": 1}},
+        {"a": [{"b": 1}, {"c": 2}, {"b": None}]},
+        {"a": []},
+        {"a": None},
+        {"a": "text"},
+        {"a": 1},
+        [{"a": 1}],
+        "text",
+    ],
+)
+def test_compile_json_path(path: str, value: Any) -> None:
+    """Test if compiled paths match the same values as jsonpath_ng."""
+    jsonpath = jsonpath_ng.parse(path)
+    try:
+        expected = [match.value for match in jsonpath.find(value)]
+    except (KeyError, TypeError):
+        # jsonpath_ng fails to index objects and numbers, they match nothing
+        expected = []
+    assert _compile_json_path(jsonpath)(value) == expected
@@ -0,0 +1,51 @@
+"""Tests for the helpers of the web app."""
+
+import pytest
+from searchengine import _accepts_gzip, _etag_matches
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        ("", False),
+        ("gzip", True),
+        ("gzip, deflate, br", True),
+        ("gzip;q=0", False),
+        ("gzip;q=0.5", True),
+        ("*", True),
+        ("*;q=0", False),
+        ("gzip;q=0, *", False),
+        ("br, *;q=0.1", True),
+        ("identity", False),
+        ("x-gzip", False),
+        ("GZIP", True),
+        ("Gzip ; Q=0", False),
+        ("gzip;q=abc", False),
+        ("gzip;q=nan", False),
+        ("gzip;q=inf", False),
+        ("gzip;q=2", False),
+        ("gzip;q=-1", False),
+        ("gzip;q=nan, *", True),
+    ],
+)
+def test_accepts_gzip(accept_encoding: str, expected: bool) -> None:
+    """Test parsing of the Accept-Encoding header."""
+    assert _accepts_gzip(accept_encoding) == expected
+
+
+@pytest.mark.parametrize(
+    ("etag", "if_none_match", "expected"),
+    [
+        ('W/"a"', 'W/"a"', True),
+        ('W/"a"', '"a"', True),
+        ('"a"', 'W/"a"', True),
+        ('W/"a"', '"b"', False),
+        ('W/"a"', "*", True),
+        ('W/"a"', '"b", W/"a"', True),
+        ('W/"a"', '"b",W/"c"', False),
+        ('W/"a"', ' "b" , "a" ', True),
+    ],
+)
+def test_etag_matches(etag: str, if_none_match: str, expected: bool) -> None:
+    """Test the weak comparison of If-None-Match against an ETag."""
+    assert _etag_matches(etag, if_none_match) == expected
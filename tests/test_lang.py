@@ -1,7 +1,7 @@
 """Tests for the language handling functions."""
 
 import pytest
-from searchengine.lang import parse_accept_language
+from searchengine.lang import detect_lang, parse_accept_language
 
 
 @pytest.mark.parametrize(
@@ -20,3 +20,14 @@ from searchengine.lang import parse_accept_language
 def test_parse_accept_language(value: str, expected: list[str]) -> None:
     """Test the parse_accept_language function."""
     assert parse_accept_language(value) == expected
+
+
+@pytest.mark.parametrize("text", ["", "1337", "42 - 17", "?!", "abc"])
+def test_detect_lang_trivial(text: str) -> None:
+    """Test that trivial texts fall back to the preferred language."""
+    assert detect_lang(text, ["de", "en"]) == "de"
+
+
+def test_detect_lang_single_language() -> None:
+    """Test that a single accepted language is returned without detection."""
+    assert detect_lang("Das ist ein deutscher Satz", ["en"]) == "en"
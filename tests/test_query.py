@@ -3,13 +3,14 @@
 from typing import Optional
 
 import pytest
-from searchengine.query import QueryParser
+from searchengine.query import ParsedQuery, QueryParser
 
 
 @pytest.mark.parametrize(
     ("query", "words", "lang", "site"),
     [
         ("This is a test!", ["This", "is", "a", "test!"], None, None),
+        ("  This   is a  test! ", ["This", "is", "a", "test!"], None, None),
         ('Th"s "is a" test!', ['Th"s', "is a", "test!"], None, None),
         ('This "is a test!', ["This", "is a test!"], None, None),
         (' This  "is   a"     test!  ', ["This", "is   a", "test!"], None, None),
@@ -32,3 +33,18 @@ def test_parse_query(
     if lang is not None:
         assert parsed_query.lang == lang
     assert parsed_query.site == site
+
+
+@pytest.mark.parametrize(
+    ("words", "site", "expected"),
+    [
+        ([], None, ""),
+        (["This", "is", "a", "test!"], None, "This is a test!"),
+        (["This", "is a", "test!"], None, 'This "is a" test!'),
+        (["test"], "example.com", "test site:example.com"),
+        ([], "example.com", "site:example.com"),
+    ],
+)
+def test_str(words: list[str], site: Optional[str], expected: str) -> None:
+    """Test the conversion of a parsed query back to a query string."""
+    assert str(ParsedQuery(words, "en", site)) == expected
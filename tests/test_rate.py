@@ -4,7 +4,12 @@ import enum
 
 import pytest
 from searchengine.engines import Engine
-from searchengine.rate import RatedResult
+from searchengine.rate import (
+    _SPAM_DOMAINS,
+    RatedResult,
+    _comparable_url,
+    rate_results,
+)
 from searchengine.results import AnswerResult, ImageResult, Result, WebResult
 from searchengine.url import Url
 
@@ -95,3 +100,48 @@ def test_rated_result_update(a: Result, b: Result, expected: bool) -> None:
     assert result.update(b, 2, _ENGINE2) == expected
     assert result.rating == (3 if expected else 1)
     assert result.engines == ({_ENGINE, _ENGINE2} if expected else {_ENGINE})
+
+
+@pytest.mark.parametrize(
+    ("a", "b", "expected"),
+    [
+        ("https://www.example.com/a", "http://example.com/a", True),
+        ("http://Example.COM/a", "http://example.com/a", True),
+        ("http://example.com/a#top", "http://example.com/a", True),
+        ("http://example.com/a?utm_source=x&id=1", "http://example.com/a?id=1", True),
+        ("http://example.com/a?fbclid=abc", "http://example.com/a", True),
+        ("http://example.com/a?id=1", "http://example.com/a?id=2", False),
+        ("http://example.com/A", "http://example.com/a", False),
+        (
+            "https://en.m.wikipedia.org/wiki/A%E2%80%93B",
+            "https://en.wikipedia.org/wiki/A-B",
+            True,
+        ),
+    ],
+)
+def test_comparable_url(a: str, b: str, expected: bool) -> None:
+    """Test normalization of URLs before comparing them."""
+    assert (_comparable_url(Url.parse(a)) == _comparable_url(Url.parse(b))) == expected
+
+
+@pytest.mark.parametrize(
+    ("host", "expected"),
+    [
+        (min(_SPAM_DOMAINS), 0.5),
+        (f"www.{min(_SPAM_DOMAINS)}", 0.5),
+        ("example.com", 1),
+    ],
+)
+def test_rated_result_eval_spam(host: str, expected: float) -> None:
+    """Test that results from listed spam domains get penalized."""
+    result = RatedResult(
+        WebResult("web", Url.parse(f"http://{host}"), None), 1, _ENGINE
+    )
+    result.eval("en", 1)
+    assert result.rating == expected
+
+
+@pytest.mark.parametrize("results", [{}, {_ENGINE: [], _ENGINE2: []}])
+def test_rate_results_empty(results: dict[Engine, list[Result]]) -> None:
+    """Test that rating no results returns no results."""
+    assert rate_results(results, "en") == []
@@ -1,8 +1,10 @@
 """Tests for the custom template filters."""
 
+import traceback
+
 import pytest
 from searchengine.query import ParsedQuery
-from searchengine.template_filter import _highlight
+from searchengine.template_filter import _highlight, _pretty_exc
 
 
 @pytest.mark.parametrize(
@@ -29,3 +31,29 @@ def test_highlight(words: list[str], before: str, after: str) -> None:
     """Test highlighting of query parts."""
     query = ParsedQuery(words, "", None)
     assert _highlight(before, query) == after
+
+
+class _CustomError(Exception):
+    pass
+
+
+class _BrokenStrError(Exception):
+    def __str__(self) -> str:
+        raise ValueError
+
+
+@pytest.mark.parametrize(
+    "exc",
+    [
+        TimeoutError(),
+        ValueError("invalid value"),
+        KeyError("key"),
+        _CustomError(),
+        _CustomError("message"),
+        _BrokenStrError(),
+        UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte"),
+    ],
+)
+def test_pretty_exc(exc: Exception) -> None:
+    """Test formatting exceptions like the traceback module does."""
+    assert _pretty_exc(exc) == traceback.format_exception_only(exc)[0]